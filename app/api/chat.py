@@ -16,14 +16,13 @@ from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.config import Settings
-from app.db.database import get_db
+from app.db.database import get_db, get_db_executor, get_session
 from app.schemas.chat import ChatStreamRequest
 from app.services import embedding as embedding_service
 from app.services import reranker as reranker_service
-from app.services.embedding import l2_normalize
 from app.errors import AppError, ErrorDetail
 from app.services.llm_client import stream_chat_completion
-from app.services.retriever import search_chunks
+from app.services.retriever import asearch_by_text_uncached, get_cached_search
 
 # ============================================
 # region 路由定义
@@ -104,17 +103,29 @@ async def stream_chat(
             details=[ErrorDetail(field="reranker", code="NOT_READY", message="重排模型未就绪")],
         )
     top_k = min(payload.top_k, settings.max_top_k)
-    embeddings = embedding_service.embed_texts([payload.query])
-    query_embedding = l2_normalize(embeddings[0])
-    results = search_chunks(
+    # 结果缓存命中时直接返回，不经线程池切换
+    results = get_cached_search(
         db,
         knowledge_base_id=payload.knowledge_base_id,
         query_text=payload.query,
-        query_embedding=query_embedding,
         top_k=top_k,
         max_rerank_candidates=settings.max_rerank_candidates,
         rerank_fn=reranker_service.rerank_texts,
     )
+    if results is None:
+        # 同步检索（向量化 + 数据库 + rerank）以独立会话放入检索专用线程池执行，避免阻塞事件循环；
+        # 相同查询的后到请求在事件循环上等待，不占用线程池
+        results = await asearch_by_text_uncached(
+            db,
+            knowledge_base_id=payload.knowledge_base_id,
+            query_text=payload.query,
+            top_k=top_k,
+            max_rerank_candidates=settings.max_rerank_candidates,
+            embed_fn=embedding_service.embed_query,
+            rerank_fn=reranker_service.rerank_texts,
+            executor=get_db_executor(),
+            open_session=get_session,
+        )
 
     sources = [
         {
@@ -16,7 +16,12 @@ from app.db.database import get_db
 from app.db.models import DocumentChunk, KnowledgeBase, KnowledgeBaseStatus
 from app.services import embedding as embedding_service
 from app.services import reranker as reranker_service
-from app.services.metrics import PROMETHEUS_CONTENT_TYPE, format_metrics, set_active_knowledge_bases, set_chunks_total
+from app.services.metrics import (
+    PROMETHEUS_CONTENT_TYPE,
+    format_metrics_bytes,
+    set_active_knowledge_bases,
+    set_chunks_total,
+)
 
 # ============================================
 # region 路由定义
@@ -71,7 +76,7 @@ def metrics(request: Request, db: Session = Depends(get_db)) -> Response:
             "指标查询失败",
             extra={"request_id": getattr(request.state, "request_id", "unknown")},
         )
-    return Response(content=format_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+    return Response(content=format_metrics_bytes(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 
 # endregion
@@ -16,8 +16,7 @@ from app.db.database import get_db
 from app.schemas.search import SearchRequest, SearchResponse, SearchResultItem
 from app.services import embedding as embedding_service
 from app.services import reranker as reranker_service
-from app.services.embedding import l2_normalize
-from app.services.retriever import search_chunks
+from app.services.retriever import search_by_text
 
 # ============================================
 # region 路由定义
@@ -38,16 +37,13 @@ def search_documents(
     """
     settings = request.app.state.settings
     top_k = min(payload.top_k, settings.max_top_k)
-    embeddings = embedding_service.embed_texts([payload.query])
-    query_embedding = l2_normalize(embeddings[0])
-
-    results = search_chunks(
+    results = search_by_text(
         db,
         knowledge_base_id=payload.knowledge_base_id,
         query_text=payload.query,
-        query_embedding=query_embedding,
         top_k=top_k,
         max_rerank_candidates=settings.max_rerank_candidates,
+        embed_fn=embedding_service.embed_query,
         rerank_fn=reranker_service.rerank_texts,
     )
     return SearchResponse(
@@ -69,6 +69,21 @@ def _get_float_env(name: str, default: float) -> float:
     except ValueError:
         return default
 
+def _get_bool_env(name: str, default: bool) -> bool:
+    """
+    读取布尔类型环境变量（1/true/yes/on 为真），缺失时使用默认值。
+
+    参数:
+        name: 环境变量名。
+        default: 缺失时的默认值。
+    返回:
+        解析后的布尔值。
+    """
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
 def _resolve_database_url() -> str:
     """
     从 RAG_DATABASE_URL 或 DATABASE_URL 解析数据库地址。
@@ -98,10 +113,12 @@ class Settings:
     """
 
     database_url: str
+    db_pool_size: int
     max_document_size: int
     max_top_k: int
     max_rerank_candidates: int
     hnsw_ef_search: int
+    use_halfvec: bool
     chunk_size: int
     chunk_overlap: int
     embedding_dim: int
@@ -109,10 +126,24 @@ class Settings:
     embedding_api_key: str
     embedding_model: str
     embedding_url: str
+    embedding_batch_size: int
+    embedding_max_concurrency: int
+    query_cache_size: int
+    query_cache_ttl_seconds: int
+    search_cache_ttl_seconds: int
+    semantic_cache_size: int
+    semantic_cache_threshold: float
+    semantic_cache_ttl_seconds: int
+    semantic_cache_lsh_tables: int
+    semantic_cache_lsh_bits: int
+    cache_warm_interval_seconds: int
+    cache_warm_top_n: int
     rerank_base_url: str
     rerank_api_key: str
     rerank_model: str
     rerank_url: str
+    rerank_batch_size: int
+    rerank_max_concurrency: int
     llm_base_url: str
     llm_api_key: str
     llm_chat_model: str
@@ -133,10 +164,12 @@ def get_settings() -> Settings:
     load_dotenv()
     return Settings(
         database_url=_resolve_database_url(),
+        db_pool_size=_get_int_env("RAG_DB_POOL_SIZE", 5),
         max_document_size=_get_int_env("RAG_MAX_DOCUMENT_SIZE", 50 * 1024 * 1024),
         max_top_k=_get_int_env("RAG_MAX_TOP_K", 20),
         max_rerank_candidates=_get_int_env("RAG_MAX_RERANK_CANDIDATES", 100),
         hnsw_ef_search=_get_int_env("RAG_HNSW_EF_SEARCH", 40),
+        use_halfvec=_get_bool_env("RAG_USE_HALFVEC", False),
         chunk_size=_get_int_env("RAG_CHUNK_SIZE", 512),
         chunk_overlap=_get_int_env("RAG_CHUNK_OVERLAP", 64),
         embedding_dim=_get_int_env("RAG_EMBEDDING_DIM", 1024),
@@ -159,6 +192,18 @@ def get_settings() -> Settings:
             _get_str_env("EMBEDDING_MODEL", ""),
         ),
         embedding_url=_get_str_env("RAG_EMBEDDING_URL", ""),
+        embedding_batch_size=_get_int_env("RAG_EMBEDDING_BATCH_SIZE", 32),
+        embedding_max_concurrency=_get_int_env("RAG_EMBEDDING_MAX_CONCURRENCY", 4),
+        query_cache_size=_get_int_env("RAG_QUERY_CACHE_SIZE", 4096),
+        query_cache_ttl_seconds=_get_int_env("RAG_QUERY_CACHE_TTL_SECONDS", 3600),
+        search_cache_ttl_seconds=_get_int_env("RAG_SEARCH_CACHE_TTL_SECONDS", 300),
+        semantic_cache_size=_get_int_env("RAG_SEMANTIC_CACHE_SIZE", 0),
+        semantic_cache_threshold=_get_float_env("RAG_SEMANTIC_CACHE_THRESHOLD", 0.97),
+        semantic_cache_ttl_seconds=_get_int_env("RAG_SEMANTIC_CACHE_TTL_SECONDS", 300),
+        semantic_cache_lsh_tables=_get_int_env("RAG_SEMANTIC_CACHE_LSH_TABLES", 8),
+        semantic_cache_lsh_bits=_get_int_env("RAG_SEMANTIC_CACHE_LSH_BITS", 8),
+        cache_warm_interval_seconds=_get_int_env("RAG_CACHE_WARM_INTERVAL_SECONDS", 0),
+        cache_warm_top_n=_get_int_env("RAG_CACHE_WARM_TOP_N", 50),
         rerank_base_url=_get_str_env(
             "RAG_RERANK_BASE_URL",
             _get_str_env(
@@ -178,6 +223,8 @@ def get_settings() -> Settings:
             _get_str_env("RERANK_MODEL", ""),
         ),
         rerank_url=_get_str_env("RAG_RERANK_URL", ""),
+        rerank_batch_size=_get_int_env("RAG_RERANK_BATCH_SIZE", 64),
+        rerank_max_concurrency=_get_int_env("RAG_RERANK_MAX_CONCURRENCY", 4),
         llm_base_url=_get_str_env(
             "RAG_LLM_BASE_URL",
             _get_str_env("SILICONFLOW_BASE_URL", ""),
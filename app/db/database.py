@@ -4,20 +4,24 @@
 主要功能:
     - 创建 SQLAlchemy 引擎与会话工厂。
     - 提供数据库依赖注入与初始化入口。
+    - 提供与连接池等大的专用检索线程池。
 依赖: SQLAlchemy, python-dotenv
 """
 
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from functools import lru_cache
-from typing import Generator, Optional
+from threading import Lock
+from typing import Generator, Iterator, Optional
 
 from sqlalchemy import create_engine, text
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import Session, sessionmaker
 
 from app.config import get_settings
-from app.db.models import Base
+from app.db.models import Base, DocumentChunk
 
 # ============================================
 # region 引擎与会话工厂
@@ -33,7 +37,14 @@ def _create_engine(database_url: str) -> Engine:
     返回:
         SQLAlchemy Engine。
     """
-    return create_engine(database_url, pool_pre_ping=True, future=True)
+    if make_url(database_url).get_backend_name() == "sqlite":
+        return create_engine(database_url, pool_pre_ping=True, future=True)
+    return create_engine(
+        database_url,
+        pool_pre_ping=True,
+        future=True,
+        pool_size=max(get_settings().db_pool_size, 1),
+    )
 
 
 @lru_cache
@@ -64,6 +75,44 @@ def get_session_factory(database_url: Optional[str] = None) -> sessionmaker:
     return sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False)
 
 
+_db_executor: Optional[ThreadPoolExecutor] = None
+_db_executor_lock = Lock()
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """
+    获取检索专用线程池（首次调用时创建）。
+
+    线程数与 RAG_DB_POOL_SIZE（引擎 pool_size）一致，避免线程在连接检出时排队，
+    也不与默认线程池中的其他任务争用。
+
+    返回:
+        ThreadPoolExecutor 实例。
+    """
+    global _db_executor
+    executor = _db_executor
+    if executor is None:
+        with _db_executor_lock:
+            if _db_executor is None:
+                _db_executor = ThreadPoolExecutor(
+                    max_workers=max(get_settings().db_pool_size, 1),
+                    thread_name_prefix="rag-db",
+                )
+            executor = _db_executor
+    return executor
+
+
+def shutdown_db_executor() -> None:
+    """
+    关闭检索专用线程池。
+    """
+    global _db_executor
+    with _db_executor_lock:
+        executor, _db_executor = _db_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
 # endregion
 # ============================================
 
@@ -81,18 +130,31 @@ def get_db(database_url: Optional[str] = None) -> Generator[Session, None, None]
     返回:
         Session 生成器。
     """
+    with get_session(database_url) as db:
+        yield db
+
+
+@contextmanager
+def get_session(database_url: Optional[str] = None) -> Iterator[Session]:
+    """
+    获取数据库会话（上下文管理器），退出时自动关闭并归还连接。
+
+    参数:
+        database_url: 可选数据库连接字符串。
+    返回:
+        Session 上下文管理器。
+    """
     session_factory = get_session_factory(database_url)
-    db = session_factory()
-    try:
+    with session_factory() as db:
         yield db
-    finally:
-        db.close()
 
 
 def init_db(database_url: Optional[str] = None) -> None:
     """
     初始化数据库结构与扩展。
 
+    启用 RAG_USE_HALFVEC 时额外创建 halfvec 表达式 HNSW 索引（需 pgvector >= 0.7）。
+
     参数:
         database_url: 可选数据库连接字符串。
     """
@@ -100,6 +162,15 @@ def init_db(database_url: Optional[str] = None) -> None:
     with engine.begin() as connection:
         connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
         Base.metadata.create_all(bind=connection)
+        if get_settings().use_halfvec:
+            dim = DocumentChunk.embedding.type.dim
+            connection.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_document_chunks_embedding_halfvec_hnsw "
+                    f"ON document_chunks USING hnsw ((embedding::halfvec({dim})) halfvec_cosine_ops) "
+                    "WITH (m = 16, ef_construction = 64)"
+                )
+            )
 
 
 # endregion
@@ -9,10 +9,14 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.exceptions import RequestValidationError
@@ -23,9 +27,13 @@ from .api.chat import router as chat_router
 from .api.knowledge_bases import router as knowledge_base_router
 from .api.observability import router as observability_router
 from .api.search import router as search_router
-from .config import get_settings
+from .config import Settings, get_settings
+from .db.database import get_session, shutdown_db_executor
 from .errors import AppError, ErrorDetail, error_response
+from .services import embedding as embedding_service
+from .services.http_client import close_http_client
 from .services.metrics import record_http_request
+from .services.retriever import warm_search_cache
 
 # ============================================
 # region 辅助函数
@@ -82,6 +90,67 @@ def _resolve_endpoint(request: Request) -> str:
     return request.url.path
 
 
+def _warm_search_cache_once(limit: int) -> int:
+    """
+    使用独立会话预热热门查询的结果缓存。
+
+    参数:
+        limit: 预热的查询条数。
+    返回:
+        成功预热的查询条数。
+    """
+    with get_session() as db:
+        return warm_search_cache(db, embed_fn=embedding_service.embed_query, limit=limit)
+
+
+async def _cache_warmer(settings: Settings, logger: logging.Logger) -> None:
+    """
+    后台定期预热热门查询（单轮失败不影响后续轮次）。
+
+    每轮在独占的单线程中执行，不占用对话检索所用的 rag-db 线程池。
+
+    参数:
+        settings: 服务配置。
+        logger: 日志实例。
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-cache-warm")
+    try:
+        while True:
+            await asyncio.sleep(settings.cache_warm_interval_seconds)
+            try:
+                warmed = await loop.run_in_executor(executor, _warm_search_cache_once, settings.cache_warm_top_n)
+            except Exception:
+                logger.exception("Cache warm-up failed")
+                continue
+            logger.info(json.dumps({"event": "cache_warm", "warmed": warmed}))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    应用生命周期钩子：按配置启动缓存预热任务；关闭时停止预热并释放检索线程池与共享 HTTP 连接池。
+
+    参数:
+        app: FastAPI 应用实例。
+    """
+    settings: Settings = app.state.settings
+    warmer = None
+    if settings.cache_warm_interval_seconds > 0:
+        warmer = asyncio.create_task(_cache_warmer(settings, app.state.logger))
+    yield
+    if warmer is not None:
+        warmer.cancel()
+        try:
+            await warmer
+        except asyncio.CancelledError:
+            pass
+    shutdown_db_executor()
+    close_http_client()
+
+
 # endregion
 # ============================================
 
@@ -100,7 +169,7 @@ def create_app() -> FastAPI:
     settings = get_settings()
     logger = _setup_logging(settings.log_level)
 
-    app = FastAPI()
+    app = FastAPI(lifespan=_lifespan)
     app.state.settings = settings
     app.state.logger = logger
 
@@ -18,6 +18,7 @@ from sqlalchemy.orm import Session
 
 from app.db.models import Document, DocumentChunk, DocumentStatus, KnowledgeBase, KnowledgeBaseStatus
 from app.errors import AppError, ErrorDetail
+from app.services.retriever import invalidate_knowledge_base
 
 # ============================================
 # region 上传校验
@@ -250,9 +251,11 @@ def delete_document(db: Session, document_id: int) -> None:
             message="文档已删除",
         )
 
+    knowledge_base_id = document.knowledge_base_id
     document.status = DocumentStatus.DELETED
     db.execute(delete(DocumentChunk).where(DocumentChunk.document_id == document_id))
     db.commit()
+    invalidate_knowledge_base(knowledge_base_id)
 
 
 # endregion
@@ -2,57 +2,107 @@
 文件名: embedding.py
 描述: 文档分块向量写入与事务控制服务。
 主要功能:
-    - 生成并归一化 embedding。
+    - 生成并归一化 embedding（支持分批并发）。
     - 事务性写入分块向量并更新文档状态。
-依赖: SQLAlchemy, httpx
+依赖: SQLAlchemy, httpx, numba（可选）
 """
 
 from __future__ import annotations
 
 import math
-from typing import Callable, Iterable, List
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 import httpx
-from sqlalchemy import delete
+from sqlalchemy import delete, insert
 from sqlalchemy.orm import Session
 
-from app.config import get_settings
+from app.config import Settings, get_settings
 from app.db.models import Document, DocumentChunk, DocumentStatus
 from app.errors import AppError, ErrorDetail
 from app.services.chunker import Chunk
+from app.services.http_client import get_http_client, read_json
 from app.services.metrics import record_document_ingestion
+from app.services.query_cache import QueryCache
+from app.services.retriever import (
+    clear_search_cache,
+    invalidate_knowledge_base,
+    invalidate_knowledge_base_after_commit,
+)
+
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:  # pragma: no cover - numba 为可选加速依赖
+    np = None
+    njit = None
 
 # ============================================
 # region 向量处理
 # ============================================
 
 
+if njit is not None:
+
+    @njit(cache=True, fastmath=True)
+    def _l2_normalize_nb(arr):  # pragma: no cover - 由 numba 编译执行
+        """
+        原地 L2 归一化（numba 编译内核）。
+
+        参数:
+            arr: 连续 float32 一维数组。
+        """
+        s = 0.0
+        for i in range(arr.shape[0]):
+            s += arr[i] * arr[i]
+        if s == 0.0:
+            return
+        inv = 1.0 / np.sqrt(s)
+        for i in range(arr.shape[0]):
+            arr[i] *= inv
+
+else:
+    _l2_normalize_nb = None
+
+
 def l2_normalize(vector: Iterable[float]) -> List[float]:
     """
     对向量进行 L2 归一化。
 
     参数:
-        vector: 输入向量。
+        vector: 输入向量（安装 numba 时转为 float32 数组走编译内核）。
     返回:
         归一化后的向量。
     """
+    if _l2_normalize_nb is not None:
+        if isinstance(vector, np.ndarray):
+            arr = np.array(vector, dtype=np.float32).reshape(-1)
+        elif isinstance(vector, (list, tuple)):
+            arr = np.asarray(vector, dtype=np.float32)
+        else:
+            arr = np.fromiter(vector, dtype=np.float32)
+        _l2_normalize_nb(arr)
+        return arr.tolist()
     values = [float(v) for v in vector]
-    norm = math.sqrt(sum(v * v for v in values))
-    if norm == 0:
+    square_sum = 0.0
+    for v in values:
+        square_sum += v * v
+    if square_sum == 0.0:
         return values
-    return [v / norm for v in values]
+    inv_norm = 1.0 / math.sqrt(square_sum)
+    return [v * inv_norm for v in values]
 
 
-def embed_texts(texts: List[str]) -> List[List[float]]:
+def _resolve_embedding_endpoint(settings: Settings) -> Tuple[str, Dict[str, str]]:
     """
-    将文本列表转为向量列表（远程调用）。
+    校验向量模型配置并生成请求地址与请求头。
 
     参数:
-        texts: 输入文本列表。
+        settings: 配置对象。
     返回:
-        向量列表。
+        (url, headers) 元组。
     """
-    settings = get_settings()
     if not settings.embedding_model:
         raise AppError(
             status_code=503,
@@ -81,16 +131,51 @@ def embed_texts(texts: List[str]) -> List[List[float]]:
         else settings.embedding_base_url.rstrip("/") + "/embeddings"
     )
     headers = {"Authorization": f"Bearer {settings.embedding_api_key}"}
-    payload = {"model": settings.embedding_model, "input": texts}
-    try:
-        response = httpx.post(url, headers=headers, json=payload, timeout=settings.llm_timeout_seconds)
-    except httpx.RequestError as exc:
-        raise AppError(
-            status_code=502,
-            code="UPSTREAM_EMBEDDING_ERROR",
-            message="向量模型调用失败",
-            details=[ErrorDetail(field="embedding", code="REQUEST_ERROR", message=str(exc))],
-        ) from exc
+    return url, headers
+
+
+def _split_batches(texts: List[str], batch_size: int) -> List[List[str]]:
+    """
+    按批大小切分文本列表。
+
+    参数:
+        texts: 输入文本列表。
+        batch_size: 每批文本数，小于等于 0 时不切分。
+    返回:
+        文本批次列表。
+    """
+    if batch_size <= 0 or len(texts) <= batch_size:
+        return [texts]
+    return [texts[start : start + batch_size] for start in range(0, len(texts), batch_size)]
+
+
+def _request_error(exc: httpx.RequestError) -> AppError:
+    """
+    将网络异常转换为上游错误。
+
+    参数:
+        exc: httpx 请求异常。
+    返回:
+        AppError 对象。
+    """
+    return AppError(
+        status_code=502,
+        code="UPSTREAM_EMBEDDING_ERROR",
+        message="向量模型调用失败",
+        details=[ErrorDetail(field="embedding", code="REQUEST_ERROR", message=str(exc))],
+    )
+
+
+def _read_embedding_response(response: httpx.Response, expected: int) -> List[List[float]]:
+    """
+    校验并解析向量模型响应。
+
+    参数:
+        response: HTTP 响应。
+        expected: 期望的向量数量。
+    返回:
+        向量列表。
+    """
     if response.status_code >= 400:
         raise AppError(
             status_code=502,
@@ -99,9 +184,9 @@ def embed_texts(texts: List[str]) -> List[List[float]]:
             details=[ErrorDetail(field="embedding", code=str(response.status_code), message=response.text)],
         )
 
-    payload_json = response.json()
+    payload_json = read_json(response)
     embeddings = _parse_embedding_response(payload_json)
-    if len(embeddings) != len(texts):
+    if len(embeddings) != expected:
         raise AppError(
             status_code=502,
             code="UPSTREAM_EMBEDDING_ERROR",
@@ -117,9 +202,93 @@ def embed_texts(texts: List[str]) -> List[List[float]]:
     return embeddings
 
 
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    """
+    将文本列表转为向量列表（远程调用）。
+
+    超过 RAG_EMBEDDING_BATCH_SIZE 的输入按批切分，并通过共享连接池并发请求。
+
+    参数:
+        texts: 输入文本列表。
+    返回:
+        向量列表。
+    """
+    settings = get_settings()
+    url, headers = _resolve_embedding_endpoint(settings)
+    client = get_http_client()
+
+    def _request(batch: List[str]) -> List[List[float]]:
+        payload = {"model": settings.embedding_model, "input": batch}
+        try:
+            response = client.post(url, headers=headers, json=payload, timeout=settings.llm_timeout_seconds)
+        except httpx.RequestError as exc:
+            raise _request_error(exc) from exc
+        return _read_embedding_response(response, len(batch))
+
+    batches = _split_batches(texts, settings.embedding_batch_size)
+    if len(batches) == 1:
+        return _request(batches[0])
+
+    max_workers = min(len(batches), max(settings.embedding_max_concurrency, 1))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rag-embedding") as executor:
+        results = list(executor.map(_request, batches))
+    return [embedding for batch_result in results for embedding in batch_result]
+
+
 _DEFAULT_EMBEDDER = embed_texts
 
 
+_query_embedding_cache: Optional[QueryCache[str, Tuple[float, ...]]] = None
+_query_embedding_cache_lock = Lock()
+
+
+def _get_query_embedding_cache() -> QueryCache[str, Tuple[float, ...]]:
+    """
+    获取查询向量缓存（首次调用时按配置创建）。
+
+    返回:
+        QueryCache 实例。
+    """
+    global _query_embedding_cache
+    cache = _query_embedding_cache
+    if cache is None:
+        with _query_embedding_cache_lock:
+            if _query_embedding_cache is None:
+                settings = get_settings()
+                _query_embedding_cache = QueryCache(
+                    max_size=settings.query_cache_size,
+                    ttl_seconds=settings.query_cache_ttl_seconds,
+                    name="query_embedding",
+                )
+            cache = _query_embedding_cache
+    return cache
+
+
+def clear_query_embedding_cache() -> None:
+    """
+    清空查询向量缓存。
+    """
+    _get_query_embedding_cache().clear()
+
+
+def embed_query(query: str) -> List[float]:
+    """
+    生成查询向量（L2 归一化），相同查询命中进程内 TTL LRU 缓存。
+
+    参数:
+        query: 查询文本。
+    返回:
+        归一化后的查询向量。
+    """
+    cache = _get_query_embedding_cache()
+    cached = cache.get(query)
+    if cached is None:
+        embeddings = embed_texts([query])
+        cached = tuple(l2_normalize(embeddings[0]))
+        cache.set(query, cached)
+    return list(cached)
+
+
 def set_embedder(embedder: Callable[[List[str]], List[List[float]]]) -> None:
     """
     设置全局 embedding 实现（用于测试或替换实现）。
@@ -129,6 +298,8 @@ def set_embedder(embedder: Callable[[List[str]], List[List[float]]]) -> None:
     """
     global embed_texts
     embed_texts = embedder
+    clear_query_embedding_cache()
+    clear_search_cache()
 
 
 def reset_embedder() -> None:
@@ -137,6 +308,8 @@ def reset_embedder() -> None:
     """
     global embed_texts
     embed_texts = _DEFAULT_EMBEDDER
+    clear_query_embedding_cache()
+    clear_search_cache()
 
 
 def is_embedder_ready() -> bool:
@@ -226,6 +399,7 @@ def persist_embeddings(
             message="文档已删除",
         )
 
+    knowledge_base_id = document.knowledge_base_id
     texts = [chunk.text for chunk in chunks]
     try:
         embeddings = embed_fn(texts)
@@ -240,27 +414,35 @@ def persist_embeddings(
         transaction = db.begin_nested() if db.in_transaction() else db.begin()
         with transaction:
             db.execute(delete(DocumentChunk).where(DocumentChunk.document_id == document_id))
-            for chunk, embedding in zip(chunks, normalized):
-                db.add(
-                    DocumentChunk(
-                        knowledge_base_id=document.knowledge_base_id,
-                        document_id=document.id,
-                        chunk_index=chunk.chunk_index,
-                        chunk_text=chunk.text,
-                        metadata_json=chunk.metadata,
-                        embedding=embedding,
-                    )
+            if chunks:
+                # 批量 INSERT（executemany），避免逐行构造 ORM 对象与 unit-of-work 开销
+                db.execute(
+                    insert(DocumentChunk),
+                    [
+                        {
+                            "knowledge_base_id": knowledge_base_id,
+                            "document_id": document.id,
+                            "chunk_index": chunk.chunk_index,
+                            "chunk_text": chunk.text,
+                            "metadata_json": chunk.metadata,
+                            "embedding": embedding,
+                        }
+                        for chunk, embedding in zip(chunks, normalized)
+                    ],
                 )
             document.chunk_count = len(chunks)
             document.status = DocumentStatus.COMPLETED
             document.error_message = None
     except Exception as exc:
         db.rollback()
-        document = db.get(Document, document_id)
+        # 回滚后 document 仍在会话中（仅属性过期），直接更新状态即可，避免再次查询
+        if document not in db:
+            document = db.get(Document, document_id)
         if document is not None:
             document.status = DocumentStatus.FAILED
             document.error_message = str(exc)
             db.commit()
+            invalidate_knowledge_base(knowledge_base_id)
         record_document_ingestion("failed")
         raise AppError(
             status_code=500,
@@ -268,7 +450,8 @@ def persist_embeddings(
             message="向量写入失败",
         ) from exc
 
-    db.refresh(document)
+    invalidate_knowledge_base_after_commit(db, knowledge_base_id)
+    # 变更字段均已在内存中设置，无需 refresh 额外查询；updated_at 等服务端字段按需懒加载
     record_document_ingestion("completed")
     return document
 
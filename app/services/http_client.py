@@ -0,0 +1,83 @@
+"""
+文件名: http_client.py
+描述: 上游模型 API 共享 HTTP 客户端。
+主要功能:
+    - 提供进程内复用的 httpx.Client（连接池 + keep-alive）。
+    - 应用关闭时释放连接池。
+    - 解析上游 JSON 响应（安装 orjson 时走 C 扩展）。
+依赖: httpx, orjson（可选）
+"""
+
+from __future__ import annotations
+
+from threading import Lock
+from typing import Any, Optional
+
+import httpx
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 为可选加速依赖
+    orjson = None
+
+# ============================================
+# region 客户端管理
+# ============================================
+
+
+_MAX_CONNECTIONS = 64
+_MAX_KEEPALIVE_CONNECTIONS = 32
+
+_lock = Lock()
+_client: Optional[httpx.Client] = None
+
+
+def get_http_client() -> httpx.Client:
+    """
+    获取共享 httpx.Client（首次调用时创建）。
+
+    返回:
+        httpx.Client 实例。
+    """
+    global _client
+    client = _client
+    if client is None:
+        with _lock:
+            if _client is None:
+                _client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=_MAX_CONNECTIONS,
+                        max_keepalive_connections=_MAX_KEEPALIVE_CONNECTIONS,
+                    )
+                )
+            client = _client
+    return client
+
+
+def close_http_client() -> None:
+    """
+    关闭共享 httpx.Client 并释放连接池。
+    """
+    global _client
+    with _lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+
+def read_json(response: httpx.Response) -> Any:
+    """
+    解析响应 JSON（优先 orjson，直接解码原始字节）。
+
+    参数:
+        response: HTTP 响应。
+    返回:
+        解析后的 JSON 对象。
+    """
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+# endregion
+# ============================================
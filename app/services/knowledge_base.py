@@ -17,6 +17,7 @@ from sqlalchemy.orm import Session
 from app.db.models import CleanupTask, CleanupTaskStatus, KnowledgeBase, KnowledgeBaseStatus
 from app.errors import AppError
 from app.schemas.knowledge_base import KnowledgeBaseCreate, KnowledgeBaseUpdate
+from app.services.retriever import invalidate_knowledge_base
 
 # ============================================
 # region 业务函数
@@ -183,6 +184,7 @@ def update_knowledge_base(
             code="KNOWLEDGE_BASE_NAME_CONFLICT",
             message="知识库名称已存在",
         )
+    invalidate_knowledge_base(kb_id)
     db.refresh(kb)
     return kb
 
@@ -219,6 +221,7 @@ def delete_knowledge_base(db: Session, kb_id: int) -> CleanupTask:
     )
     db.add(task)
     db.commit()
+    invalidate_knowledge_base(kb_id)
     db.refresh(task)
     return task
 
@@ -4,14 +4,19 @@
 主要功能:
     - 记录 HTTP 请求量与延迟直方图。
     - 记录文档摄取成功/失败计数与资源数量 Gauge。
-    - 输出 Prometheus 文本格式指标。
+    - 记录查询缓存命中/未命中/淘汰计数。
+    - 输出 Prometheus 文本格式指标（str 与 UTF-8 bytes 两种形式）。
 依赖: 标准库
 """
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from threading import Lock
+import os
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import accumulate
+from threading import Lock, get_native_id
 from typing import Dict, List, Tuple
 
 # ============================================
@@ -20,19 +25,24 @@ from typing import Dict, List, Tuple
 
 
 PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
-HISTOGRAM_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+HISTOGRAM_BUCKETS: Tuple[float, ...] = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 预先格式化并编码的 le 标签值（桶边界固定不变）
+_BUCKET_LE_LABELS: Tuple[bytes, ...] = tuple(
+    f"{bound:.2f}".rstrip("0").rstrip(".").encode() for bound in HISTOGRAM_BUCKETS
+)
 
 _lock = Lock()
-_http_requests_total: Dict[Tuple[str, str, str], int] = {}
-_http_request_duration: Dict[Tuple[str, str], "HistogramState"] = {}
-_document_ingestion_total: Dict[str, int] = {}
+# Counter.update 在 C 层完成计数（GIL 下原子），纯计数器无需加锁
+_http_requests_total: Counter[Tuple[str, str, str]] = Counter()
+_document_ingestion_total: Counter[str] = Counter()
+_query_cache_events_total: Counter[Tuple[str, str]] = Counter()
 _knowledge_bases_active = 0
 _chunks_total = 0
 
 
 @dataclass
 class HistogramState:
-    """直方图状态。"""
+    """直方图状态（bucket_counts 为各桶独立计数，输出时再累加）。"""
 
     bucket_counts: List[int]
     count: int = 0
@@ -45,11 +55,72 @@ class HistogramState:
         参数:
             value: 观测值。
         """
+        index = bisect_left(HISTOGRAM_BUCKETS, value)
+        if index < len(self.bucket_counts):
+            self.bucket_counts[index] += 1
         self.count += 1
         self.total += value
-        for index, bound in enumerate(HISTOGRAM_BUCKETS):
-            if value <= bound:
-                self.bucket_counts[index] += 1
+
+    def copy(self) -> "HistogramState":
+        """
+        复制当前状态。
+
+        返回:
+            HistogramState 副本。
+        """
+        return HistogramState(bucket_counts=list(self.bucket_counts), count=self.count, total=self.total)
+
+    def merge(self, other: "HistogramState") -> None:
+        """
+        合并另一个直方图状态。
+
+        参数:
+            other: 待合并的直方图状态。
+        """
+        self.bucket_counts = [left + right for left, right in zip(self.bucket_counts, other.bucket_counts)]
+        self.count += other.count
+        self.total += other.total
+
+
+@dataclass
+class _HttpMetricsShard:
+    """HTTP 延迟直方图分片（按线程分散写入，降低锁竞争）。"""
+
+    lock: Lock = field(default_factory=Lock)
+    request_duration: Dict[Tuple[str, str], HistogramState] = field(default_factory=dict)
+
+
+def _shard_count() -> int:
+    """
+    计算分片数量（CPU 数 * 2 向上取整到 2 的幂）。
+
+    返回:
+        分片数量。
+    """
+    target = max((os.cpu_count() or 1) * 2, 1)
+    return 1 << (target - 1).bit_length()
+
+
+_HTTP_SHARD_MASK = _shard_count() - 1
+_http_shards = tuple(_HttpMetricsShard() for _ in range(_HTTP_SHARD_MASK + 1))
+# 采集时各分片增量并入此汇总表，仅采集/重置路径持有 _scrape_lock，不阻塞写入
+_scrape_lock = Lock()
+_http_request_duration: Dict[Tuple[str, str], HistogramState] = {}
+
+
+def _drain_http_shards() -> None:
+    """
+    交换各分片的直方图表并将增量并入汇总表（调用方需持有 _scrape_lock）。
+    """
+    for shard in _http_shards:
+        with shard.lock:
+            pending, shard.request_duration = shard.request_duration, {}
+        for key, state in pending.items():
+            merged = _http_request_duration.get(key)
+            if merged is None:
+                _http_request_duration[key] = state
+            else:
+                merged.merge(state)
 
 
 # endregion
@@ -73,14 +144,15 @@ def record_http_request(method: str, endpoint: str, status: str, duration_second
     normalized_method = (method or "UNKNOWN").upper()
     normalized_endpoint = endpoint or "unknown"
     normalized_status = status or "0"
-    with _lock:
-        key = (normalized_method, normalized_endpoint, normalized_status)
-        _http_requests_total[key] = _http_requests_total.get(key, 0) + 1
-        hist_key = (normalized_method, normalized_endpoint)
-        state = _http_request_duration.get(hist_key)
+    key = (normalized_method, normalized_endpoint, normalized_status)
+    hist_key = (normalized_method, normalized_endpoint)
+    _http_requests_total.update((key,))
+    shard = _http_shards[get_native_id() & _HTTP_SHARD_MASK]
+    with shard.lock:
+        state = shard.request_duration.get(hist_key)
         if state is None:
             state = HistogramState(bucket_counts=[0 for _ in HISTOGRAM_BUCKETS])
-            _http_request_duration[hist_key] = state
+            shard.request_duration[hist_key] = state
         state.observe(max(duration_seconds, 0.0))
 
 
@@ -92,8 +164,18 @@ def record_document_ingestion(status: str) -> None:
         status: 摄取状态（completed/failed）。
     """
     normalized_status = status or "unknown"
-    with _lock:
-        _document_ingestion_total[normalized_status] = _document_ingestion_total.get(normalized_status, 0) + 1
+    _document_ingestion_total.update((normalized_status,))
+
+
+def record_query_cache_event(cache: str, event: str) -> None:
+    """
+    记录查询缓存事件计数。
+
+    参数:
+        cache: 缓存名称。
+        event: 事件类型（hit/miss/eviction）。
+    """
+    _query_cache_events_total.update(((cache, event),))
 
 
 def set_active_knowledge_bases(count: int) -> None:
@@ -124,11 +206,16 @@ def reset_metrics() -> None:
     """
     重置指标状态（测试用）。
     """
+    _http_requests_total.clear()
+    with _scrape_lock:
+        for shard in _http_shards:
+            with shard.lock:
+                shard.request_duration = {}
+        _http_request_duration.clear()
+    _document_ingestion_total.clear()
+    _query_cache_events_total.clear()
     with _lock:
         global _knowledge_bases_active, _chunks_total
-        _http_requests_total.clear()
-        _http_request_duration.clear()
-        _document_ingestion_total.clear()
         _knowledge_bases_active = 0
         _chunks_total = 0
 
@@ -141,6 +228,24 @@ def reset_metrics() -> None:
 # ============================================
 
 
+_LABEL_ESCAPE_TABLE = str.maketrans({"\\": "\\\\", "\n": "\\n", '"': '\\"'})
+
+# 固定的 HELP/TYPE 头部，导入时编码一次
+_HTTP_REQUESTS_HEADER = "# HELP http_requests_total HTTP 请求计数\n# TYPE http_requests_total counter\n".encode()
+_HTTP_DURATION_HEADER = (
+    "# HELP http_request_duration_seconds HTTP 请求耗时分布\n"
+    "# TYPE http_request_duration_seconds histogram\n"
+).encode()
+_DOCUMENT_INGESTION_HEADER = "# HELP document_ingestion_total 文档摄取计数\n# TYPE document_ingestion_total counter\n".encode()
+_KNOWLEDGE_BASES_ACTIVE_HEADER = (
+    "# HELP knowledge_bases_active 活跃知识库数量\n# TYPE knowledge_bases_active gauge\nknowledge_bases_active "
+).encode()
+_CHUNKS_TOTAL_HEADER = "# HELP chunks_total 分块向量总数\n# TYPE chunks_total gauge\nchunks_total ".encode()
+_QUERY_CACHE_EVENTS_HEADER = (
+    "# HELP query_cache_events_total 查询缓存命中/未命中/淘汰计数\n# TYPE query_cache_events_total counter\n"
+).encode()
+
+
 def _escape_label(value: str) -> str:
     """
     转义 Prometheus 标签值。
@@ -150,7 +255,7 @@ def _escape_label(value: str) -> str:
     返回:
         转义后的标签值。
     """
-    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return value.translate(_LABEL_ESCAPE_TABLE)
 
 
 def _format_labels(labels: Dict[str, str]) -> str:
@@ -168,68 +273,87 @@ def _format_labels(labels: Dict[str, str]) -> str:
     return "{" + ",".join(parts) + "}"
 
 
-def format_metrics() -> str:
+def format_metrics_bytes() -> bytes:
     """
-    生成 Prometheus 文本格式指标。
+    生成 Prometheus 文本格式指标（UTF-8 字节串，可直接写入响应）。
 
     返回:
-        Prometheus 文本格式字符串。
+        Prometheus 文本格式字节串。
     """
+    http_requests_total = dict(_http_requests_total)
+    with _scrape_lock:
+        _drain_http_shards()
+        http_request_duration = {key: state.copy() for key, state in _http_request_duration.items()}
+    document_ingestion_total = dict(_document_ingestion_total)
+    query_cache_events_total = dict(_query_cache_events_total)
     with _lock:
-        http_requests_total = dict(_http_requests_total)
-        http_request_duration = {
-            key: HistogramState(bucket_counts=list(state.bucket_counts), count=state.count, total=state.total)
-            for key, state in _http_request_duration.items()
-        }
-        document_ingestion_total = dict(_document_ingestion_total)
         knowledge_bases_active = _knowledge_bases_active
         chunks_total = _chunks_total
 
-    lines: List[str] = []
+    buf = bytearray()
 
     # http_requests_total
-    lines.append("# HELP http_requests_total HTTP 请求计数")
-    lines.append("# TYPE http_requests_total counter")
+    buf += _HTTP_REQUESTS_HEADER
     for key in sorted(http_requests_total.keys()):
         method, endpoint, status = key
-        labels = _format_labels({"method": method, "endpoint": endpoint, "status": status})
-        lines.append(f"http_requests_total{labels} {http_requests_total[key]}")
+        labels = _format_labels({"method": method, "endpoint": endpoint, "status": status}).encode()
+        buf += b"http_requests_total%b %d\n" % (labels, http_requests_total[key])
 
     # http_request_duration_seconds
-    lines.append("# HELP http_request_duration_seconds HTTP 请求耗时分布")
-    lines.append("# TYPE http_request_duration_seconds histogram")
+    buf += _HTTP_DURATION_HEADER
     for key in sorted(http_request_duration.keys()):
         method, endpoint = key
         state = http_request_duration[key]
-        for bound, count in zip(HISTOGRAM_BUCKETS, state.bucket_counts):
-            labels = _format_labels(
-                {"method": method, "endpoint": endpoint, "le": f"{bound:.2f}".rstrip("0").rstrip(".")}
+        # 每个 key 只转义、编码一次标签；标签按名称排序输出（endpoint, le, method）
+        endpoint_label = f'endpoint="{_escape_label(endpoint)}"'.encode()
+        method_label = f'method="{_escape_label(method)}"'.encode()
+        for le, count in zip(_BUCKET_LE_LABELS, accumulate(state.bucket_counts)):
+            buf += b'http_request_duration_seconds_bucket{%b,le="%b",%b} %d\n' % (
+                endpoint_label,
+                le,
+                method_label,
+                count,
             )
-            lines.append(f"http_request_duration_seconds_bucket{labels} {count}")
-        labels = _format_labels({"method": method, "endpoint": endpoint, "le": "+Inf"})
-        lines.append(f"http_request_duration_seconds_bucket{labels} {state.count}")
-        labels = _format_labels({"method": method, "endpoint": endpoint})
-        lines.append(f"http_request_duration_seconds_sum{labels} {state.total:.6f}")
-        lines.append(f"http_request_duration_seconds_count{labels} {state.count}")
+        buf += b'http_request_duration_seconds_bucket{%b,le="+Inf",%b} %d\n' % (
+            endpoint_label,
+            method_label,
+            state.count,
+        )
+        buf += b"http_request_duration_seconds_sum{%b,%b} %.6f\n" % (endpoint_label, method_label, state.total)
+        buf += b"http_request_duration_seconds_count{%b,%b} %d\n" % (endpoint_label, method_label, state.count)
 
     # document_ingestion_total
-    lines.append("# HELP document_ingestion_total 文档摄取计数")
-    lines.append("# TYPE document_ingestion_total counter")
+    buf += _DOCUMENT_INGESTION_HEADER
     for status in sorted(document_ingestion_total.keys()):
-        labels = _format_labels({"status": status})
-        lines.append(f"document_ingestion_total{labels} {document_ingestion_total[status]}")
+        labels = _format_labels({"status": status}).encode()
+        buf += b"document_ingestion_total%b %d\n" % (labels, document_ingestion_total[status])
 
     # knowledge_bases_active
-    lines.append("# HELP knowledge_bases_active 活跃知识库数量")
-    lines.append("# TYPE knowledge_bases_active gauge")
-    lines.append(f"knowledge_bases_active {knowledge_bases_active}")
+    buf += _KNOWLEDGE_BASES_ACTIVE_HEADER
+    buf += b"%d\n" % knowledge_bases_active
 
     # chunks_total
-    lines.append("# HELP chunks_total 分块向量总数")
-    lines.append("# TYPE chunks_total gauge")
-    lines.append(f"chunks_total {chunks_total}")
+    buf += _CHUNKS_TOTAL_HEADER
+    buf += b"%d\n" % chunks_total
+
+    # query_cache_events_total
+    buf += _QUERY_CACHE_EVENTS_HEADER
+    for key in sorted(query_cache_events_total.keys()):
+        cache, event = key
+        labels = _format_labels({"cache": cache, "event": event}).encode()
+        buf += b"query_cache_events_total%b %d\n" % (labels, query_cache_events_total[key])
+
+    return bytes(buf)
+
+
+def format_metrics() -> str:
+    """
+    生成 Prometheus 文本格式指标。
 
-    return "\n".join(lines) + "\n"
+    返回:
+        Prometheus 文本格式字符串。
+    """
+    return format_metrics_bytes().decode("utf-8")
 
 
 # endregion
@@ -4,19 +4,35 @@
 主要功能:
     - 解析文本/Markdown/HTML/图片等文件内容。
     - 生成统一的解析结果与元数据。
-依赖: 标准库, FastAPI
+依赖: 标准库, FastAPI, selectolax（可选）, pypdfium2（可选）
 """
 
 from __future__ import annotations
 
+import codecs
 import io
 import os
 from dataclasses import dataclass
 from html.parser import HTMLParser
+from threading import Lock
 from typing import Any, Callable, Dict, Optional
 
 from app.errors import AppError, ErrorDetail
 
+try:
+    from selectolax.lexbor import LexborHTMLParser as _FastHTMLParser
+except ImportError:  # pragma: no cover - selectolax 为可选加速依赖
+    try:
+        # selectolax < 1.0 仅提供 Modest 后端
+        from selectolax.parser import HTMLParser as _FastHTMLParser
+    except ImportError:
+        _FastHTMLParser = None
+
+try:
+    import pypdfium2 as _pdfium
+except ImportError:  # pragma: no cover - pypdfium2 为可选加速依赖
+    _pdfium = None
+
 # ============================================
 # region 数据结构
 # ============================================
@@ -46,22 +62,47 @@ class _HTMLTextExtractor(HTMLParser):
         self._chunks: list[str] = []
 
     def handle_data(self, data: str) -> None:
-        if data.strip():
-            self._chunks.append(data.strip())
+        stripped = data.strip()
+        if stripped:
+            self._chunks.append(stripped)
 
     def get_text(self) -> str:
         return "\n".join(self._chunks)
 
 
+def _html_to_text_fast(content: str) -> str:
+    """
+    使用 selectolax（C 实现）提取 HTML 文本节点。
+
+    参数:
+        content: HTML 字符串。
+    返回:
+        提取后的纯文本。
+    """
+    root = _FastHTMLParser(content).root
+    if root is None:
+        return ""
+    chunks: list[str] = []
+    for node in root.traverse(include_text=True):
+        if node.tag != "-text":
+            continue
+        stripped = (node.text(deep=False) or "").strip()
+        if stripped:
+            chunks.append(stripped)
+    return "\n".join(chunks)
+
+
 def _html_to_text(content: str) -> str:
     """
-    将 HTML 转换为纯文本。
+    将 HTML 转换为纯文本（已安装 selectolax 时使用 C 解析器）。
 
     参数:
         content: HTML 字符串。
     返回:
         提取后的纯文本。
     """
+    if _FastHTMLParser is not None:
+        return _html_to_text_fast(content)
     parser = _HTMLTextExtractor()
     parser.feed(content)
     return parser.get_text()
@@ -90,16 +131,36 @@ DOC_EXTENSIONS = {
     ".pptx",
 }
 
+_converter: Optional[Any] = None
+_converter_lock = Lock()
+_pdfium_lock = Lock()
+
+_OcrHandler = Callable[[bytes], str]
+_ParseHandler = Callable[[str, bytes, Optional[_OcrHandler]], "ParsedDocument"]
+
+
+_BOM_ENCODINGS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
 
 def _decode_bytes(data: bytes) -> str:
     """
-    尝试解码文本内容。
+    尝试解码文本内容（优先按 BOM 识别编码，避免整段解码失败后重试）。
 
     参数:
         data: 原始字节数据。
     返回:
         解码后的字符串。
     """
+    for bom, encoding in _BOM_ENCODINGS:
+        if data.startswith(bom):
+            try:
+                return data.decode(encoding)
+            except UnicodeDecodeError:
+                break
     for encoding in ("utf-8", "utf-16", "gb18030", "latin-1"):
         try:
             return data.decode(encoding)
@@ -108,6 +169,171 @@ def _decode_bytes(data: bytes) -> str:
     return data.decode("utf-8", errors="replace")
 
 
+def _parse_text(filename: str, content: bytes, ocr_handler: Optional[_OcrHandler]) -> ParsedDocument:
+    """
+    解析纯文本/Markdown 内容。
+
+    参数:
+        filename: 文件名。
+        content: 文件内容字节。
+        ocr_handler: OCR 处理函数（未使用）。
+    返回:
+        ParsedDocument 对象。
+    """
+    return ParsedDocument(
+        text=_decode_bytes(content),
+        metadata={"filename": filename, "page_range": None, "ocr_skipped": False},
+    )
+
+
+def _parse_html(filename: str, content: bytes, ocr_handler: Optional[_OcrHandler]) -> ParsedDocument:
+    """
+    解析 HTML 内容为纯文本。
+
+    参数:
+        filename: 文件名。
+        content: 文件内容字节。
+        ocr_handler: OCR 处理函数（未使用）。
+    返回:
+        ParsedDocument 对象。
+    """
+    return ParsedDocument(
+        text=_html_to_text(_decode_bytes(content)),
+        metadata={"filename": filename, "page_range": None, "ocr_skipped": False},
+    )
+
+
+def _parse_image(filename: str, content: bytes, ocr_handler: Optional[_OcrHandler]) -> ParsedDocument:
+    """
+    解析图片内容（依赖 OCR，未提供时跳过）。
+
+    参数:
+        filename: 文件名。
+        content: 文件内容字节。
+        ocr_handler: OCR 处理函数。
+    返回:
+        ParsedDocument 对象。
+    """
+    if ocr_handler is None:
+        return ParsedDocument(
+            text="",
+            metadata={"filename": filename, "page_range": None, "ocr_skipped": True},
+        )
+    ocr_text = ocr_handler(content)
+    return ParsedDocument(
+        text=ocr_text,
+        metadata={"filename": filename, "page_range": None, "ocr_skipped": False},
+    )
+
+
+def _get_converter() -> Any:
+    """
+    获取共享的 MarkItDown 转换器（首次调用时创建）。
+
+    返回:
+        MarkItDown 实例。
+    """
+    global _converter
+    converter = _converter
+    if converter is None:
+        with _converter_lock:
+            if _converter is None:
+                try:
+                    from markitdown import MarkItDown
+                except ImportError as exc:
+                    raise AppError(
+                        status_code=500,
+                        code="INTERNAL_ERROR",
+                        message="文档解析组件未安装",
+                        details=[ErrorDetail(field="file", code="PARSER_MISSING", message=str(exc))],
+                    ) from exc
+                _converter = MarkItDown()
+            converter = _converter
+    return converter
+
+
+def _pdf_to_text_fast(content: bytes) -> str:
+    """
+    使用 pdfium 逐页提取 PDF 文本（pdfium 非线程安全，提取全程持锁）。
+
+    参数:
+        content: PDF 文件字节。
+    返回:
+        各页文本（页间以空行分隔）。
+    """
+    pages: list[str] = []
+    with _pdfium_lock:
+        pdf = _pdfium.PdfDocument(content)
+        try:
+            for page in pdf:
+                textpage = page.get_textpage()
+                pages.append(textpage.get_text_range().replace("\r\n", "\n"))
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
+    return "\n\n".join(pages)
+
+
+def _parse_office(filename: str, content: bytes, ocr_handler: Optional[_OcrHandler]) -> ParsedDocument:
+    """
+    使用 markitdown 解析 PDF/Office 文档（安装 pypdfium2 时 PDF 走 pdfium 提取）。
+
+    参数:
+        filename: 文件名。
+        content: 文件内容字节。
+        ocr_handler: OCR 处理函数（未使用）。
+    返回:
+        ParsedDocument 对象。
+    """
+    if _pdfium is not None and filename.lower().endswith(".pdf"):
+        try:
+            text = _pdf_to_text_fast(content)
+        except _pdfium.PdfiumError:
+            pass  # pdfium 无法打开时回退 markitdown，保持原有错误语义
+        else:
+            return ParsedDocument(
+                text=text,
+                metadata={"filename": filename, "page_range": None, "ocr_skipped": False},
+            )
+
+    converter = _get_converter()
+    with io.BytesIO(content) as stream:
+        result = converter.convert(stream, filename=filename)
+    return ParsedDocument(
+        text=result.text_content,
+        metadata={"filename": filename, "page_range": None, "ocr_skipped": False},
+    )
+
+
+_CONTENT_TYPE_HANDLERS: Dict[str, _ParseHandler] = {
+    "text/plain": _parse_text,
+    "text/markdown": _parse_text,
+    "text/html": _parse_html,
+    **{content_type: _parse_image for content_type in IMAGE_TYPES},
+}
+
+_EXTENSION_HANDLERS: Dict[str, _ParseHandler] = {
+    ".txt": _parse_text,
+    ".md": _parse_text,
+    ".markdown": _parse_text,
+    ".html": _parse_html,
+    ".htm": _parse_html,
+    ".png": _parse_image,
+    ".jpg": _parse_image,
+    ".jpeg": _parse_image,
+    **{ext: _parse_office for ext in DOC_EXTENSIONS},
+}
+
+# content_type 与扩展名指向不同处理器时按优先级选择：HTML > 文本 > 图片 > Office
+_HANDLER_PRIORITY: Dict[_ParseHandler, int] = {
+    _parse_html: 0,
+    _parse_text: 1,
+    _parse_image: 2,
+    _parse_office: 3,
+}
+
+
 def parse_document(
     *,
     filename: str,
@@ -127,53 +353,19 @@ def parse_document(
         ParsedDocument 对象。
     """
     ext = os.path.splitext(filename.lower())[1]
-
-    if content_type in SUPPORTED_TEXT_TYPES or ext in {".txt", ".md", ".markdown", ".html", ".htm"}:
-        text = _decode_bytes(content)
-        if content_type == "text/html" or ext in {".html", ".htm"}:
-            text = _html_to_text(text)
-        return ParsedDocument(
-            text=text,
-            metadata={"filename": filename, "page_range": None, "ocr_skipped": False},
-        )
-
-    if content_type in IMAGE_TYPES or ext in {".png", ".jpg", ".jpeg"}:
-        if ocr_handler is None:
-            return ParsedDocument(
-                text="",
-                metadata={"filename": filename, "page_range": None, "ocr_skipped": True},
-            )
-        ocr_text = ocr_handler(content)
-        return ParsedDocument(
-            text=ocr_text,
-            metadata={"filename": filename, "page_range": None, "ocr_skipped": False},
+    handler = _CONTENT_TYPE_HANDLERS.get(content_type)
+    ext_handler = _EXTENSION_HANDLERS.get(ext)
+    if handler is None or (ext_handler is not None and _HANDLER_PRIORITY[ext_handler] < _HANDLER_PRIORITY[handler]):
+        handler = ext_handler
+
+    if handler is None:
+        raise AppError(
+            status_code=415,
+            code="UNSUPPORTED_MEDIA_TYPE",
+            message="不支持的文件格式",
+            details=[ErrorDetail(field="file", code="UNSUPPORTED", message="文件格式不被支持")],
         )
-
-    if ext in DOC_EXTENSIONS:
-        try:
-            from markitdown import MarkItDown
-        except ImportError as exc:
-            raise AppError(
-                status_code=500,
-                code="INTERNAL_ERROR",
-                message="文档解析组件未安装",
-                details=[ErrorDetail(field="file", code="PARSER_MISSING", message=str(exc))],
-            ) from exc
-
-        converter = MarkItDown()
-        with io.BytesIO(content) as stream:
-            result = converter.convert(stream, filename=filename)
-        return ParsedDocument(
-            text=result.text_content,
-            metadata={"filename": filename, "page_range": None, "ocr_skipped": False},
-        )
-
-    raise AppError(
-        status_code=415,
-        code="UNSUPPORTED_MEDIA_TYPE",
-        message="不支持的文件格式",
-        details=[ErrorDetail(field="file", code="UNSUPPORTED", message="文件格式不被支持")],
-    )
+    return handler(filename, content, ocr_handler)
 
 
 # endregion
@@ -0,0 +1,432 @@
+"""
+文件名: query_cache.py
+描述: 进程内查询缓存。
+主要功能:
+    - 提供带容量上限与过期时间的线程安全 LRU 缓存。
+    - 提供按向量余弦相似度命中的语义缓存。
+    - 统计热门查询频次（用于缓存预热）。
+    - 命名缓存上报命中/未命中/淘汰计数到 /metrics。
+依赖: 标准库, NumPy
+"""
+
+from __future__ import annotations
+
+import time
+from collections import Counter, OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Generic, Hashable, List, Optional, Sequence, Set, Tuple, TypeVar
+
+import numpy as np
+
+from app.services.metrics import record_query_cache_event
+
+# ============================================
+# region 缓存实现
+# ============================================
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class QueryCache(Generic[K, V]):
+    """
+    线程安全的 TTL + LRU 缓存。
+
+    超出容量时淘汰最久未使用的条目；ttl_seconds <= 0 表示不过期，max_size <= 0 表示禁用缓存。
+    指定 name 时命中/未命中/淘汰计入 query_cache_events_total。
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, name: Optional[str] = None) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self._entries: "OrderedDict[K, Tuple[float, V]]" = OrderedDict()
+        self._lock = Lock()
+
+    def _record(self, event: str) -> None:
+        """
+        上报缓存事件（未命名缓存不上报）。
+
+        参数:
+            event: 事件类型。
+        """
+        if self.name is not None:
+            record_query_cache_event(self.name, event)
+
+    def get(self, key: K) -> Optional[V]:
+        """
+        读取缓存并刷新其 LRU 位置。
+
+        参数:
+            key: 缓存键。
+        返回:
+            命中时返回缓存值，未命中或已过期返回 None。
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at and expires_at <= time.monotonic():
+                    del self._entries[key]
+                else:
+                    self._entries.move_to_end(key)
+                    self._record("hit")
+                    return value
+        self._record("miss")
+        return None
+
+    def set(self, key: K, value: V) -> None:
+        """
+        写入缓存，必要时淘汰最久未使用条目。
+
+        参数:
+            key: 缓存键。
+            value: 缓存值。
+        """
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else 0.0
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                evicted += 1
+        for _ in range(evicted):
+            self._record("eviction")
+
+    def invalidate(self, key: K) -> None:
+        """
+        删除单个缓存条目。
+
+        参数:
+            key: 缓存键。
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[K], bool]) -> None:
+        """
+        删除键满足条件的全部条目。
+
+        参数:
+            predicate: 缓存键判定函数。
+        """
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """
+        清空缓存。
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SemanticCache(Generic[V]):
+    """
+    语义缓存：查询向量与已缓存向量余弦相似度达到阈值即命中。
+
+    条目按命名空间隔离（如知识库 + 检索参数），容量在全部命名空间间共享，超出时淘汰最久未使用条目。
+    lsh_tables > 0 时以随机超平面 LSH（lsh_tables 张表 × lsh_bits 位）分桶，仅与同桶候选计算余弦；
+    否则同一命名空间的向量堆叠为矩阵全量比对。ttl_seconds <= 0 表示不过期，max_size <= 0 表示禁用缓存。
+    指定 name 时命中/未命中/淘汰计入 query_cache_events_total。
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        threshold: float,
+        ttl_seconds: float = 0.0,
+        name: Optional[str] = None,
+        lsh_tables: int = 0,
+        lsh_bits: int = 8,
+        seed: int = 0,
+    ) -> None:
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self.lsh_tables = max(lsh_tables, 0)
+        self.lsh_bits = min(max(lsh_bits, 1), 62)
+        self._seed = seed
+        self._projections: Optional[np.ndarray] = None
+        self._bit_weights = np.left_shift(np.int64(1), np.arange(self.lsh_bits, dtype=np.int64))
+        self._entries: "OrderedDict[int, Tuple[Hashable, float, V]]" = OrderedDict()
+        self._namespaces: Dict[Hashable, Dict[int, np.ndarray]] = {}
+        self._matrices: Dict[Hashable, Tuple[Tuple[int, ...], np.ndarray]] = {}
+        self._buckets: Dict[Tuple[Hashable, int, int], Set[int]] = {}
+        self._entry_buckets: Dict[int, Tuple[int, ...]] = {}
+        self._next_id = 0
+        self._lock = Lock()
+
+    def _record(self, event: str) -> None:
+        """
+        上报缓存事件（未命名缓存不上报）。
+
+        参数:
+            event: 事件类型。
+        """
+        if self.name is not None:
+            record_query_cache_event(self.name, event)
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> Optional[np.ndarray]:
+        """
+        转为 float32 单位向量。
+
+        参数:
+            vector: 输入向量。
+        返回:
+            单位向量；零向量返回 None。
+        """
+        arr = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(arr))
+        if norm == 0.0:
+            return None
+        return arr / norm
+
+    def _bucket_keys(self, vector: np.ndarray) -> Optional[Tuple[int, ...]]:
+        """
+        计算向量在各 LSH 表中的桶编号（投影矩阵按首个向量维度懒创建并冻结）。
+
+        参数:
+            vector: 单位向量。
+        返回:
+            各表桶编号；维度与投影矩阵不一致时返回 None。
+        """
+        projections = self._projections
+        if projections is None:
+            with self._lock:
+                if self._projections is None:
+                    rng = np.random.default_rng(self._seed)
+                    self._projections = rng.standard_normal(
+                        (self.lsh_tables * self.lsh_bits, vector.shape[0])
+                    ).astype(np.float32)
+                projections = self._projections
+        if projections.shape[1] != vector.shape[0]:
+            return None
+        signs = (projections @ vector > 0).reshape(self.lsh_tables, self.lsh_bits)
+        return tuple(int(key) for key in signs.astype(np.int64) @ self._bit_weights)
+
+    def _matrix(self, namespace: Hashable) -> Optional[Tuple[Tuple[int, ...], np.ndarray]]:
+        """
+        获取命名空间的堆叠向量矩阵（变更后懒重建），需持有锁调用。
+        """
+        cached = self._matrices.get(namespace)
+        if cached is not None:
+            return cached
+        vectors = self._namespaces.get(namespace)
+        if not vectors:
+            return None
+        cached = (tuple(vectors.keys()), np.stack(list(vectors.values())))
+        self._matrices[namespace] = cached
+        return cached
+
+    def _candidates(
+        self, namespace: Hashable, keys: Tuple[int, ...]
+    ) -> Optional[Tuple[Tuple[int, ...], np.ndarray]]:
+        """
+        收集与查询同桶的候选条目及其向量矩阵，需持有锁调用。
+        """
+        entry_ids: Set[int] = set()
+        for table, key in enumerate(keys):
+            bucket = self._buckets.get((namespace, table, key))
+            if bucket:
+                entry_ids.update(bucket)
+        if not entry_ids:
+            return None
+        vectors = self._namespaces[namespace]
+        ordered = tuple(entry_ids)
+        return ordered, np.stack([vectors[entry_id] for entry_id in ordered])
+
+    def _remove(self, entry_id: int) -> None:
+        """
+        删除单个条目并维护命名空间与分桶索引，需持有锁调用。
+        """
+        namespace, _, _ = self._entries.pop(entry_id)
+        vectors = self._namespaces[namespace]
+        del vectors[entry_id]
+        if not vectors:
+            del self._namespaces[namespace]
+        self._matrices.pop(namespace, None)
+        for table, key in enumerate(self._entry_buckets.pop(entry_id, ())):
+            bucket_key = (namespace, table, key)
+            bucket = self._buckets.get(bucket_key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[bucket_key]
+
+    def get(self, namespace: Hashable, vector: Sequence[float]) -> Optional[V]:
+        """
+        查找与查询向量足够相似的缓存值。
+
+        参数:
+            namespace: 命名空间。
+            vector: 查询向量。
+        返回:
+            命中时返回缓存值，未命中或最相似条目已过期返回 None。
+        """
+        if self.max_size <= 0:
+            return None
+        query = self._normalize(vector)
+        if query is None:
+            return None
+        keys = self._bucket_keys(query) if self.lsh_tables else None
+        with self._lock:
+            if not self.lsh_tables:
+                cached = self._matrix(namespace)
+            elif keys is not None:
+                cached = self._candidates(namespace, keys)
+            else:
+                cached = None
+            if cached is not None:
+                entry_ids, matrix = cached
+                similarities = matrix @ query
+                best = int(np.argmax(similarities))
+                if float(similarities[best]) >= self.threshold:
+                    entry_id = entry_ids[best]
+                    _, expires_at, value = self._entries[entry_id]
+                    if expires_at and expires_at <= time.monotonic():
+                        self._remove(entry_id)
+                    else:
+                        self._entries.move_to_end(entry_id)
+                        self._record("hit")
+                        return value
+        self._record("miss")
+        return None
+
+    def set(self, namespace: Hashable, vector: Sequence[float], value: V) -> None:
+        """
+        写入缓存，必要时淘汰最久未使用条目。
+
+        参数:
+            namespace: 命名空间。
+            vector: 查询向量。
+            value: 缓存值。
+        """
+        if self.max_size <= 0:
+            return
+        normalized = self._normalize(vector)
+        if normalized is None:
+            return
+        keys: Tuple[int, ...] = ()
+        if self.lsh_tables:
+            bucket_keys = self._bucket_keys(normalized)
+            if bucket_keys is None:
+                return
+            keys = bucket_keys
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else 0.0
+        evicted = 0
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (namespace, expires_at, value)
+            self._namespaces.setdefault(namespace, {})[entry_id] = normalized
+            self._matrices.pop(namespace, None)
+            if keys:
+                self._entry_buckets[entry_id] = keys
+                for table, key in enumerate(keys):
+                    self._buckets.setdefault((namespace, table, key), set()).add(entry_id)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                evicted += 1
+        for _ in range(evicted):
+            self._record("eviction")
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> None:
+        """
+        删除命名空间满足条件的全部条目。
+
+        参数:
+            predicate: 命名空间判定函数。
+        """
+        with self._lock:
+            for namespace in [ns for ns in self._namespaces if predicate(ns)]:
+                for entry_id in list(self._namespaces[namespace]):
+                    self._remove(entry_id)
+
+    def clear(self) -> None:
+        """
+        清空缓存。
+        """
+        with self._lock:
+            self._entries.clear()
+            self._namespaces.clear()
+            self._matrices.clear()
+            self._buckets.clear()
+            self._entry_buckets.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class QueryFrequency(Generic[K]):
+    """
+    有界查询频次统计。
+
+    键数超过 max_size 时仅保留计数最高的一半；decay 将全部计数减半，使统计偏向近期查询。
+    max_size <= 0 表示禁用统计。
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._counts: Counter[K] = Counter()
+        self._lock = Lock()
+
+    def record(self, key: K) -> None:
+        """
+        记录一次查询。
+
+        参数:
+            key: 查询键。
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._counts[key] += 1
+            if len(self._counts) > self.max_size:
+                self._counts = Counter(dict(self._counts.most_common(max(self.max_size // 2, 1))))
+
+    def most_common(self, limit: int) -> List[Tuple[K, int]]:
+        """
+        获取频次最高的查询。
+
+        参数:
+            limit: 返回条数。
+        返回:
+            (查询键, 次数) 列表，按次数降序。
+        """
+        with self._lock:
+            return self._counts.most_common(limit)
+
+    def decay(self) -> None:
+        """
+        全部计数减半并移除归零的键。
+        """
+        with self._lock:
+            self._counts = Counter({key: count // 2 for key, count in self._counts.items() if count > 1})
+
+    def clear(self) -> None:
+        """
+        清空统计。
+        """
+        with self._lock:
+            self._counts.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._counts)
+
+
+# endregion
+# ============================================
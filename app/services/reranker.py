@@ -2,18 +2,20 @@
 文件名: reranker.py
 描述: 重排服务占位实现。
 主要功能:
-    - 将查询与候选文本进行重排打分。
+    - 将查询与候选文本进行重排打分（超出批大小时分批并发请求）。
 依赖: httpx
 """
 
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import Callable, List
 
 import httpx
 
 from app.config import get_settings
 from app.errors import AppError, ErrorDetail
+from app.services.http_client import get_http_client, read_json
 
 # ============================================
 # region 重排接口
@@ -24,6 +26,8 @@ def rerank_texts(query: str, candidates: List[str]) -> List[float]:
     """
     重排打分（远程调用）。
 
+    超过 RAG_RERANK_BATCH_SIZE 的候选按批切分，并通过共享连接池并发请求。
+
     参数:
         query: 查询文本。
         candidates: 候选文本列表。
@@ -57,40 +61,54 @@ def rerank_texts(query: str, candidates: List[str]) -> List[float]:
 
     url = settings.rerank_url if settings.rerank_url else settings.rerank_base_url.rstrip("/") + "/rerank"
     headers = {"Authorization": f"Bearer {settings.rerank_api_key}"}
-    payload = {"model": settings.rerank_model, "query": query, "documents": candidates}
-    try:
-        response = httpx.post(url, headers=headers, json=payload, timeout=settings.llm_timeout_seconds)
-    except httpx.RequestError as exc:
-        raise AppError(
-            status_code=502,
-            code="UPSTREAM_RERANK_ERROR",
-            message="重排模型调用失败",
-            details=[ErrorDetail(field="rerank", code="REQUEST_ERROR", message=str(exc))],
-        ) from exc
-    if response.status_code >= 400:
-        raise AppError(
-            status_code=502,
-            code="UPSTREAM_RERANK_ERROR",
-            message="重排模型调用失败",
-            details=[ErrorDetail(field="rerank", code=str(response.status_code), message=response.text)],
-        )
 
-    payload_json = response.json()
-    scores = _parse_rerank_response(payload_json, len(candidates))
-    if len(scores) != len(candidates):
-        raise AppError(
-            status_code=502,
-            code="UPSTREAM_RERANK_ERROR",
-            message="重排模型返回数量不一致",
-            details=[
-                ErrorDetail(
-                    field="rerank",
-                    code="COUNT_MISMATCH",
-                    message="重排分数数量与候选数量不一致",
-                )
-            ],
-        )
-    return scores
+    def _request(batch: List[str]) -> List[float]:
+        payload = {"model": settings.rerank_model, "query": query, "documents": batch}
+        try:
+            response = get_http_client().post(
+                url, headers=headers, json=payload, timeout=settings.llm_timeout_seconds
+            )
+        except httpx.RequestError as exc:
+            raise AppError(
+                status_code=502,
+                code="UPSTREAM_RERANK_ERROR",
+                message="重排模型调用失败",
+                details=[ErrorDetail(field="rerank", code="REQUEST_ERROR", message=str(exc))],
+            ) from exc
+        if response.status_code >= 400:
+            raise AppError(
+                status_code=502,
+                code="UPSTREAM_RERANK_ERROR",
+                message="重排模型调用失败",
+                details=[ErrorDetail(field="rerank", code=str(response.status_code), message=response.text)],
+            )
+
+        payload_json = read_json(response)
+        scores = _parse_rerank_response(payload_json, len(batch))
+        if len(scores) != len(batch):
+            raise AppError(
+                status_code=502,
+                code="UPSTREAM_RERANK_ERROR",
+                message="重排模型返回数量不一致",
+                details=[
+                    ErrorDetail(
+                        field="rerank",
+                        code="COUNT_MISMATCH",
+                        message="重排分数数量与候选数量不一致",
+                    )
+                ],
+            )
+        return scores
+
+    batch_size = settings.rerank_batch_size if settings.rerank_batch_size > 0 else len(candidates)
+    batches = [candidates[i : i + batch_size] for i in range(0, len(candidates), batch_size)]
+    if len(batches) == 1:
+        return _request(batches[0])
+
+    max_workers = min(len(batches), max(settings.rerank_max_concurrency, 1))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rag-rerank") as executor:
+        results = list(executor.map(_request, batches))
+    return [score for batch_scores in results for score in batch_scores]
 
 
 _DEFAULT_RERANKER = rerank_texts
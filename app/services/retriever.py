@@ -4,20 +4,31 @@
 主要功能:
     - 根据查询向量执行 pgvector 检索。
     - 调用 rerank 模型进行精排。
-依赖: SQLAlchemy
+    - 相同查询命中结果缓存，跳过向量化、检索与重排。
+    - 相似查询命中语义缓存，跳过检索与重排。
+    - 并发的相同查询合并为一次执行（single-flight）。
+    - 统计热门查询并支持后台预热结果缓存。
+依赖: SQLAlchemy, NumPy
 """
 
 from __future__ import annotations
 
-import math
+import asyncio
+import heapq
+from concurrent.futures import Executor, Future
 from dataclasses import dataclass
-from typing import Callable, List
+from threading import Lock
+from typing import Callable, ContextManager, Dict, Hashable, List, Optional, Sequence, Tuple
 
-from sqlalchemy import select
+import numpy as np
+from pgvector.sqlalchemy import HALFVEC
+from sqlalchemy import cast, event, select
 from sqlalchemy.orm import Session
 
+from app.config import get_settings
 from app.db.models import Document, DocumentChunk, DocumentStatus, KnowledgeBase, KnowledgeBaseStatus
 from app.errors import AppError, ErrorDetail
+from app.services.query_cache import QueryCache, QueryFrequency, SemanticCache
 
 # ============================================
 # region 数据结构
@@ -43,16 +54,175 @@ class SearchResult:
 # ============================================
 
 
-def _sigmoid(value: float) -> float:
+def _sigmoid(values: Sequence[float]) -> List[float]:
     """
-    Sigmoid 归一化。
+    批量 Sigmoid 归一化（NumPy 向量化）。
 
     参数:
-        value: 原始分数。
+        values: 原始分数序列。
     返回:
-        归一化分数。
+        归一化分数列表。
     """
-    return 1 / (1 + math.exp(-value))
+    arr = np.asarray(values, dtype=np.float64)
+    return (1.0 / (1.0 + np.exp(-arr))).tolist()
+
+
+# endregion
+# ============================================
+
+# ============================================
+# region 检索缓存
+# ============================================
+
+
+_result_cache: Optional[QueryCache[Tuple[Hashable, ...], Tuple[SearchResult, ...]]] = None
+_semantic_cache: Optional[SemanticCache[Tuple[SearchResult, ...]]] = None
+_query_frequency: Optional[QueryFrequency[Tuple[Hashable, ...]]] = None
+_cache_lock = Lock()
+# 进行中的检索（键同结果缓存），后到的相同查询等待首个请求的结果
+_inflight: Dict[Tuple[Hashable, ...], "Future[Tuple[SearchResult, ...]]"] = {}
+_inflight_lock = Lock()
+# 知识库缓存代数：失效时递增，检索开始后代数变化则结果不写入缓存
+_generations: Dict[int, int] = {}
+_generation_lock = Lock()
+
+
+def _get_result_cache() -> QueryCache[Tuple[Hashable, ...], Tuple[SearchResult, ...]]:
+    """
+    获取检索结果精确缓存（首次调用时按配置创建）。
+
+    返回:
+        QueryCache 实例。
+    """
+    global _result_cache
+    cache = _result_cache
+    if cache is None:
+        with _cache_lock:
+            if _result_cache is None:
+                settings = get_settings()
+                _result_cache = QueryCache(
+                    max_size=settings.query_cache_size,
+                    ttl_seconds=settings.search_cache_ttl_seconds,
+                    name="search_result",
+                )
+            cache = _result_cache
+    return cache
+
+
+def _get_semantic_cache() -> SemanticCache[Tuple[SearchResult, ...]]:
+    """
+    获取检索结果语义缓存（首次调用时按配置创建）。
+
+    返回:
+        SemanticCache 实例。
+    """
+    global _semantic_cache
+    cache = _semantic_cache
+    if cache is None:
+        with _cache_lock:
+            if _semantic_cache is None:
+                settings = get_settings()
+                _semantic_cache = SemanticCache(
+                    max_size=settings.semantic_cache_size,
+                    threshold=settings.semantic_cache_threshold,
+                    ttl_seconds=settings.semantic_cache_ttl_seconds,
+                    name="search_semantic",
+                    lsh_tables=settings.semantic_cache_lsh_tables,
+                    lsh_bits=settings.semantic_cache_lsh_bits,
+                )
+            cache = _semantic_cache
+    return cache
+
+
+def _get_query_frequency() -> QueryFrequency[Tuple[Hashable, ...]]:
+    """
+    获取热门查询频次统计（首次调用时按配置创建）。
+
+    未开启缓存预热（RAG_CACHE_WARM_INTERVAL_SECONDS <= 0）时统计禁用，记录为空操作。
+
+    返回:
+        QueryFrequency 实例。
+    """
+    global _query_frequency
+    frequency = _query_frequency
+    if frequency is None:
+        with _cache_lock:
+            if _query_frequency is None:
+                settings = get_settings()
+                max_size = settings.query_cache_size if settings.cache_warm_interval_seconds > 0 else 0
+                _query_frequency = QueryFrequency(max_size=max_size)
+            frequency = _query_frequency
+    return frequency
+
+
+def _cache_generation(knowledge_base_id: int) -> int:
+    """
+    读取知识库当前缓存代数（须在读取数据库之前调用）。
+
+    参数:
+        knowledge_base_id: 知识库 ID。
+    返回:
+        缓存代数。
+    """
+    with _generation_lock:
+        return _generations.get(knowledge_base_id, 0)
+
+
+def _store_if_current(knowledge_base_id: int, generation: int, store: Callable[[], None]) -> None:
+    """
+    知识库缓存代数未变化时执行缓存写入（与失效操作互斥，避免检索期间的变更被旧结果覆盖）。
+
+    参数:
+        knowledge_base_id: 知识库 ID。
+        generation: 检索开始前读取的缓存代数。
+        store: 缓存写入函数。
+    """
+    with _generation_lock:
+        if _generations.get(knowledge_base_id, 0) == generation:
+            store()
+
+
+def invalidate_knowledge_base(knowledge_base_id: int) -> None:
+    """
+    使指定知识库的检索缓存失效（文档写入、删除及知识库状态变更后调用）。
+
+    递增缓存代数，使进行中的检索不再写入缓存，并令后续相同查询不再合并到进行中的检索。
+
+    参数:
+        knowledge_base_id: 知识库 ID。
+    """
+    with _generation_lock:
+        _generations[knowledge_base_id] = _generations.get(knowledge_base_id, 0) + 1
+        _get_result_cache().invalidate_where(lambda key: key[0] == knowledge_base_id)
+        _get_semantic_cache().invalidate(lambda namespace: namespace[0] == knowledge_base_id)
+    with _inflight_lock:
+        for key in [key for key in _inflight if key[0] == knowledge_base_id]:
+            del _inflight[key]
+
+
+def invalidate_knowledge_base_after_commit(db: Session, knowledge_base_id: int) -> None:
+    """
+    在会话提交后使指定知识库的检索缓存失效；会话无进行中事务时立即失效。
+
+    写入位于调用方未提交的外层事务（或 SAVEPOINT）中时，提前失效会让并发检索把提交前的旧数据重新写入缓存。
+
+    参数:
+        db: 数据库会话。
+        knowledge_base_id: 知识库 ID。
+    """
+    if not db.in_transaction():
+        invalidate_knowledge_base(knowledge_base_id)
+        return
+    event.listen(db, "after_commit", lambda session: invalidate_knowledge_base(knowledge_base_id), once=True)
+
+
+def clear_search_cache() -> None:
+    """
+    清空检索结果缓存与热门查询统计。
+    """
+    _get_result_cache().clear()
+    _get_semantic_cache().clear()
+    _get_query_frequency().clear()
 
 
 # endregion
@@ -72,10 +242,14 @@ def search_chunks(
     top_k: int,
     max_rerank_candidates: int,
     rerank_fn: Callable[[str, List[str]], List[float]],
+    use_semantic_cache: bool = True,
 ) -> List[SearchResult]:
     """
     执行语义检索与重排。
 
+    同一知识库与检索参数下，查询向量与已缓存查询的余弦相似度达到
+    RAG_SEMANTIC_CACHE_THRESHOLD 时直接返回缓存结果。
+
     参数:
         db: 数据库会话。
         knowledge_base_id: 知识库 ID。
@@ -84,6 +258,7 @@ def search_chunks(
         top_k: 返回条数。
         max_rerank_candidates: rerank 最大候选数。
         rerank_fn: rerank 函数（query + 候选文本 => 分数列表）。
+        use_semantic_cache: 是否读取语义缓存（为 False 时总是重新检索，结果仍写入缓存）。
     返回:
         SearchResult 列表。
     """
@@ -107,10 +282,20 @@ def search_chunks(
     if candidate_count <= 0:
         return []
 
+    generation = _cache_generation(knowledge_base_id)
+    cache = _get_semantic_cache()
+    namespace = (knowledge_base_id, db.get_bind(), top_k, candidate_count, rerank_fn)
+    cached = cache.get(namespace, query_embedding) if use_semantic_cache else None
+    if cached is not None:
+        return list(cached)
+
+    # 仅选取结果所需列，避免 ORM 实体水合与宽行传输
     stmt = (
         select(
-            DocumentChunk,
-            Document,
+            DocumentChunk.chunk_text,
+            DocumentChunk.chunk_index,
+            DocumentChunk.document_id,
+            Document.filename,
         )
         .join(Document, DocumentChunk.document_id == Document.id)
         .where(DocumentChunk.knowledge_base_id == knowledge_base_id)
@@ -118,15 +303,21 @@ def search_chunks(
     )
     dialect_name = db.get_bind().dialect.name if db.get_bind() is not None else ""
     if dialect_name != "sqlite" and hasattr(DocumentChunk.embedding, "cosine_distance"):
-        stmt = stmt.order_by(DocumentChunk.embedding.cosine_distance(query_embedding))
+        if get_settings().use_halfvec:
+            # 与 init_db 创建的 halfvec 表达式索引一致，按半精度扫描以减半内存带宽
+            halfvec_type = HALFVEC(DocumentChunk.embedding.type.dim)
+            stmt = stmt.order_by(
+                cast(DocumentChunk.embedding, halfvec_type).cosine_distance(cast(query_embedding, halfvec_type))
+            )
+        else:
+            stmt = stmt.order_by(DocumentChunk.embedding.cosine_distance(query_embedding))
     stmt = stmt.limit(candidate_count)
     rows = db.execute(stmt).all()
     if not rows:
+        _store_if_current(knowledge_base_id, generation, lambda: cache.set(namespace, query_embedding, ()))
         return []
 
-    chunks = [row[0] for row in rows]
-    documents = {row[0].document_id: row[1] for row in rows}
-    texts = [chunk.chunk_text for chunk in chunks]
+    texts = [row.chunk_text for row in rows]
 
     scores = rerank_fn(query_text, texts)
     if len(scores) != len(texts):
@@ -135,26 +326,329 @@ def search_chunks(
             code="INTERNAL_ERROR",
             message="重排结果数量不一致",
         )
-    normalized = [_sigmoid(score) for score in scores]
-
-    ranked = list(zip(chunks, normalized))
-    ranked.sort(key=lambda item: item[1], reverse=True)
-    top = ranked[:top_k]
-
-    results = []
-    for chunk, score in top:
-        doc = documents.get(chunk.document_id)
-        results.append(
-            SearchResult(
-                chunk_text=chunk.chunk_text,
-                score=score,
-                document_id=chunk.document_id,
-                filename=doc.filename if doc else "",
-                chunk_index=chunk.chunk_index,
-            )
+    normalized = _sigmoid(scores)
+
+    top = heapq.nlargest(top_k, zip(rows, normalized), key=lambda item: item[1])
+
+    results = [
+        SearchResult(
+            chunk_text=row.chunk_text,
+            score=score,
+            document_id=row.document_id,
+            filename=row.filename,
+            chunk_index=row.chunk_index,
         )
+        for row, score in top
+    ]
+    _store_if_current(knowledge_base_id, generation, lambda: cache.set(namespace, query_embedding, tuple(results)))
     return results
 
 
+def _search_cache_key(
+    db: Session,
+    knowledge_base_id: int,
+    query_text: str,
+    top_k: int,
+    max_rerank_candidates: int,
+    rerank_fn: Callable[[str, List[str]], List[float]],
+) -> Tuple[Hashable, ...]:
+    """
+    生成检索结果缓存键（含绑定引擎，避免不同数据库间串用缓存）。
+
+    参数:
+        db: 数据库会话。
+        knowledge_base_id: 知识库 ID。
+        query_text: 原始查询文本。
+        top_k: 返回条数。
+        max_rerank_candidates: rerank 最大候选数。
+        rerank_fn: rerank 函数。
+    返回:
+        缓存键元组。
+    """
+    return (knowledge_base_id, db.get_bind(), query_text, top_k, max_rerank_candidates, rerank_fn)
+
+
+def get_cached_search(
+    db: Session,
+    *,
+    knowledge_base_id: int,
+    query_text: str,
+    top_k: int,
+    max_rerank_candidates: int,
+    rerank_fn: Callable[[str, List[str]], List[float]],
+) -> Optional[List[SearchResult]]:
+    """
+    仅查询结果缓存（不访问数据库与模型服务，可在事件循环中直接调用），并计入热门查询统计。
+
+    参数:
+        db: 数据库会话（仅用于确定绑定引擎）。
+        knowledge_base_id: 知识库 ID。
+        query_text: 原始查询文本。
+        top_k: 返回条数。
+        max_rerank_candidates: rerank 最大候选数。
+        rerank_fn: rerank 函数。
+    返回:
+        命中时返回 SearchResult 列表，否则返回 None。
+    """
+    _get_query_frequency().record((knowledge_base_id, query_text, top_k, max_rerank_candidates, rerank_fn))
+    key = _search_cache_key(db, knowledge_base_id, query_text, top_k, max_rerank_candidates, rerank_fn)
+    cached = _get_result_cache().get(key)
+    return list(cached) if cached is not None else None
+
+
+def search_by_text(
+    db: Session,
+    *,
+    knowledge_base_id: int,
+    query_text: str,
+    top_k: int,
+    max_rerank_candidates: int,
+    embed_fn: Callable[[str], List[float]],
+    rerank_fn: Callable[[str, List[str]], List[float]],
+) -> List[SearchResult]:
+    """
+    按查询文本检索：相同查询命中结果缓存时直接返回，否则向量化后执行 search_chunks。
+
+    参数:
+        db: 数据库会话。
+        knowledge_base_id: 知识库 ID。
+        query_text: 原始查询文本。
+        top_k: 返回条数。
+        max_rerank_candidates: rerank 最大候选数。
+        embed_fn: 查询向量化函数（返回归一化向量）。
+        rerank_fn: rerank 函数（query + 候选文本 => 分数列表）。
+    返回:
+        SearchResult 列表。
+    """
+    cached = get_cached_search(
+        db,
+        knowledge_base_id=knowledge_base_id,
+        query_text=query_text,
+        top_k=top_k,
+        max_rerank_candidates=max_rerank_candidates,
+        rerank_fn=rerank_fn,
+    )
+    if cached is not None:
+        return cached
+    return search_by_text_uncached(
+        db,
+        knowledge_base_id=knowledge_base_id,
+        query_text=query_text,
+        top_k=top_k,
+        max_rerank_candidates=max_rerank_candidates,
+        embed_fn=embed_fn,
+        rerank_fn=rerank_fn,
+    )
+
+
+def _join_inflight(key: Tuple[Hashable, ...]) -> Tuple["Future[Tuple[SearchResult, ...]]", bool]:
+    """
+    登记或加入进行中的相同检索。
+
+    新登记的 Future 直接置为运行状态，等待者的取消不会传递到共享 Future。
+
+    参数:
+        key: 检索结果缓存键。
+    返回:
+        (共享 Future, 是否为首个请求)。
+    """
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future, False
+        future = Future()
+        future.set_running_or_notify_cancel()
+        _inflight[key] = future
+        return future, True
+
+
+def _release_inflight(key: Tuple[Hashable, ...], future: "Future[Tuple[SearchResult, ...]]") -> None:
+    """
+    移除进行中检索的登记。
+
+    参数:
+        key: 检索结果缓存键。
+        future: 共享 Future。
+    """
+    with _inflight_lock:
+        # 失效后同键可能已由新的检索登记，仅移除自身
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+def _lead_search(
+    key: Tuple[Hashable, ...],
+    future: "Future[Tuple[SearchResult, ...]]",
+    knowledge_base_id: int,
+    run_search: Callable[[], List[SearchResult]],
+) -> List[SearchResult]:
+    """
+    以首个请求身份执行检索：写入结果缓存并将结果（或异常）通知等待者。
+
+    参数:
+        key: 检索结果缓存键。
+        future: 共享 Future。
+        knowledge_base_id: 知识库 ID。
+        run_search: 实际执行检索的函数。
+    返回:
+        SearchResult 列表。
+    """
+    generation = _cache_generation(knowledge_base_id)
+    try:
+        results = run_search()
+        _store_if_current(knowledge_base_id, generation, lambda: _get_result_cache().set(key, tuple(results)))
+        future.set_result(tuple(results))
+        return results
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    finally:
+        _release_inflight(key, future)
+
+
+def search_by_text_uncached(
+    db: Session,
+    *,
+    knowledge_base_id: int,
+    query_text: str,
+    top_k: int,
+    max_rerank_candidates: int,
+    embed_fn: Callable[[str], List[float]],
+    rerank_fn: Callable[[str, List[str]], List[float]],
+    use_semantic_cache: bool = True,
+) -> List[SearchResult]:
+    """
+    跳过结果缓存查询直接检索（调用方已确认未命中），完成后写入结果缓存。
+
+    并发到达的相同查询只由首个请求执行，其余请求等待并共享其结果（或异常）。
+
+    参数:
+        db: 数据库会话。
+        knowledge_base_id: 知识库 ID。
+        query_text: 原始查询文本。
+        top_k: 返回条数。
+        max_rerank_candidates: rerank 最大候选数。
+        embed_fn: 查询向量化函数（返回归一化向量）。
+        rerank_fn: rerank 函数（query + 候选文本 => 分数列表）。
+        use_semantic_cache: 是否读取语义缓存。
+    返回:
+        SearchResult 列表。
+    """
+    key = _search_cache_key(db, knowledge_base_id, query_text, top_k, max_rerank_candidates, rerank_fn)
+    future, is_leader = _join_inflight(key)
+    if not is_leader:
+        return list(future.result())
+    return _lead_search(
+        key,
+        future,
+        knowledge_base_id,
+        lambda: search_chunks(
+            db,
+            knowledge_base_id=knowledge_base_id,
+            query_text=query_text,
+            query_embedding=embed_fn(query_text),
+            top_k=top_k,
+            max_rerank_candidates=max_rerank_candidates,
+            rerank_fn=rerank_fn,
+            use_semantic_cache=use_semantic_cache,
+        ),
+    )
+
+
+async def asearch_by_text_uncached(
+    db: Session,
+    *,
+    knowledge_base_id: int,
+    query_text: str,
+    top_k: int,
+    max_rerank_candidates: int,
+    embed_fn: Callable[[str], List[float]],
+    rerank_fn: Callable[[str, List[str]], List[float]],
+    executor: Executor,
+    open_session: Callable[[], ContextManager[Session]],
+) -> List[SearchResult]:
+    """
+    search_by_text_uncached 的异步版本：仅首个请求提交到 executor 执行，
+    并发到达的相同查询在事件循环上等待其结果，不占用线程池线程。
+
+    检索在 executor 中使用 open_session 打开的独立会话执行，调用方协程被取消时检索仍会完成并通知其他等待者。
+
+    参数:
+        db: 请求会话（仅用于确定绑定引擎，不跨线程使用）。
+        knowledge_base_id: 知识库 ID。
+        query_text: 原始查询文本。
+        top_k: 返回条数。
+        max_rerank_candidates: rerank 最大候选数。
+        embed_fn: 查询向量化函数（返回归一化向量）。
+        rerank_fn: rerank 函数（query + 候选文本 => 分数列表）。
+        executor: 执行检索的线程池。
+        open_session: 会话上下文管理器工厂。
+    返回:
+        SearchResult 列表。
+    """
+    key = _search_cache_key(db, knowledge_base_id, query_text, top_k, max_rerank_candidates, rerank_fn)
+    future, is_leader = _join_inflight(key)
+    if is_leader:
+
+        def _search_in_new_session() -> List[SearchResult]:
+            with open_session() as session:
+                return search_chunks(
+                    session,
+                    knowledge_base_id=knowledge_base_id,
+                    query_text=query_text,
+                    query_embedding=embed_fn(query_text),
+                    top_k=top_k,
+                    max_rerank_candidates=max_rerank_candidates,
+                    rerank_fn=rerank_fn,
+                )
+
+        try:
+            executor.submit(_lead_search, key, future, knowledge_base_id, _search_in_new_session)
+        except BaseException as exc:
+            future.set_exception(exc)
+            _release_inflight(key, future)
+            raise
+    return list(await asyncio.wrap_future(future))
+
+
+def warm_search_cache(
+    db: Session,
+    *,
+    embed_fn: Callable[[str], List[float]],
+    limit: int,
+) -> int:
+    """
+    重新执行最热门的查询以刷新结果缓存（在过期前续期），随后衰减频次统计。
+
+    预热绕过语义缓存，总是重新检索与重排，使缓存结果反映最新数据；知识库不可用等业务错误的查询直接跳过。
+
+    参数:
+        db: 数据库会话。
+        embed_fn: 查询向量化函数（返回归一化向量）。
+        limit: 预热的查询条数。
+    返回:
+        成功预热的查询条数。
+    """
+    frequency = _get_query_frequency()
+    warmed = 0
+    for (knowledge_base_id, query_text, top_k, max_rerank_candidates, rerank_fn), _ in frequency.most_common(limit):
+        try:
+            search_by_text_uncached(
+                db,
+                knowledge_base_id=knowledge_base_id,
+                query_text=query_text,
+                top_k=top_k,
+                max_rerank_candidates=max_rerank_candidates,
+                embed_fn=embed_fn,
+                rerank_fn=rerank_fn,
+                use_semantic_cache=False,
+            )
+        except AppError:
+            continue
+        warmed += 1
+    frequency.decay()
+    return warmed
+
+
 # endregion
 # ============================================